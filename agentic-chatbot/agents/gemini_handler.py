@@ -1,17 +1,92 @@
 import google.generativeai as genai
-from typing import Optional, Dict, Any
+from google.api_core import exceptions as google_exceptions
+from typing import Optional, Dict, Any, Tuple, Iterator
+from collections import OrderedDict
+from functools import lru_cache
 from config import config
+from exceptions import GeminiAPIError
+from constants import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, MODEL_CACHE_FILE, MODEL_CACHE_TTL
+import hashlib
+import json
 import logging
+import os
+import re
+import tempfile
+import threading
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# (label, keywords) in priority order; the first label with a hit wins
+ENTITY_KEYWORDS = (
+    ("users", ("user", "customer", "person", "people")),
+    ("products", ("product", "item", "goods")),
+    ("orders", ("order", "sale", "purchase", "transaction")),
+    ("all", ("all", "everything", "summary", "overview")),
+)
+
+ACTION_KEYWORDS = (
+    ("count", ("count", "how many", "number", "total")),
+    ("list", ("show", "display", "list", "get", "find", "search")),
+    ("price_query", ("price", "cost", "expensive", "cheap")),
+)
+
+_KEYWORD_LABELS = {
+    keyword: label
+    for label, keywords in ENTITY_KEYWORDS + ACTION_KEYWORDS
+    for keyword in keywords
+}
+
+# The zero-width lookahead reports a hit at every offset, so one left-to-right
+# pass finds every keyword, including ones that overlap inside a word
+_KEYWORD_SCAN = re.compile(
+    "(?=(" + "|".join(re.escape(keyword) for keyword in _KEYWORD_LABELS) + "))"
+)
+
+BASIC_MODE_RESPONSE = "I'm running in basic mode. For AI features, please add your Gemini API key to the .env file."
+
+# Preferred models, most capable first
+GEMINI_MODEL_CANDIDATES = (
+    "gemini-1.5-pro",
+    "gemini-1.5-flash",
+    "gemini-pro",
+    "gemini-1.0-pro",
+)
+
+@lru_cache(maxsize=512)
+def _classify_query(query_lower: str) -> Tuple[str, str]:
+    """Map a lowercased query to its (entity, action) pair"""
+    labels = {_KEYWORD_LABELS[match.group(1)] for match in _KEYWORD_SCAN.finditer(query_lower)}
+    entity = next((label for label, _ in ENTITY_KEYWORDS if label in labels), "general")
+    action = next((label for label, _ in ACTION_KEYWORDS if label in labels), "general")
+    return entity, action
+
 class GeminiHandler:
+    # One handler per process so model setup and the response cache are shared
+    _instance = None
+    _instance_lock = threading.Lock()
+    _initialized = False
+    
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+        return cls._instance
+    
     def __init__(self):
-        self.api_key = config.GEMINI_API_KEY
-        self.model = None
-        self.model_name = None
-        self.initialize()
+        with self._instance_lock:
+            if self._initialized:
+                return
+            self.api_key = config.GEMINI_API_KEY
+            self.model = None
+            self.model_name = None
+            self._model_from_cache = False
+            self._model_lock = threading.Lock()
+            self._cache = OrderedDict()
+            self._cache_lock = threading.Lock()
+            self.initialize()
+            self._initialized = True
     
     def initialize(self):
         """Initialize Gemini AI with automatic model detection"""
@@ -23,45 +98,109 @@ class GeminiHandler:
             logger.info("🔧 Initializing Gemini AI...")
             genai.configure(api_key=self.api_key)
             
-            # List available models
-            models = genai.list_models()
-            available_models = [model.name for model in models]
-            logger.info(f"📋 Available models: {available_models}")
-            
-            # Try to find a suitable Gemini model
-            gemini_models = [
-                "gemini-1.5-pro",
-                "gemini-1.5-flash", 
-                "gemini-pro",
-                "gemini-1.0-pro",
-                "models/gemini-1.5-pro",
-                "models/gemini-1.5-flash"
-            ]
-            
-            for model_candidate in gemini_models:
-                for available_model in available_models:
-                    if model_candidate in available_model:
-                        try:
-                            self.model_name = available_model
-                            self.model = genai.GenerativeModel(available_model)
-                            logger.info(f"✅ Using Gemini model: {available_model}")
-                            return
-                        except Exception as e:
-                            logger.warning(f"Could not initialize {available_model}: {e}")
-                            continue
+            # An explicit or recently cached model name skips list_models() entirely
+            model_name = config.GEMINI_MODEL_NAME
+            if not model_name:
+                model_name = self._load_cached_model_name()
+                self._model_from_cache = model_name is not None
+            if model_name:
+                self.model_name = model_name
+                self.model = genai.GenerativeModel(model_name)
+                logger.info(f"✅ Using Gemini model: {model_name}")
+                return
             
-            # If no specific model found, try the first available
-            if available_models:
-                self.model_name = available_models[0]
-                self.model = genai.GenerativeModel(available_models[0])
-                logger.info(f"✅ Using available model: {available_models[0]}")
-            else:
+            if not self._use_discovered_model():
                 logger.error("❌ No available models found")
                 
         except Exception as e:
             logger.error(f"❌ Failed to initialize Gemini AI: {e}")
             self.model = None
     
+    def _use_discovered_model(self) -> bool:
+        """Switch to the preferred available model and remember it for later starts"""
+        model_name = self._discover_model_name()
+        if not model_name:
+            return False
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self._save_cached_model_name(model_name)
+        logger.info(f"✅ Using Gemini model: {model_name}")
+        return True
+    
+    def _discover_model_name(self) -> Optional[str]:
+        """Pick the preferred Gemini model from the models available to this key"""
+        available_models = [model.name for model in genai.list_models()]
+        logger.info(f"📋 Available models: {available_models}")
+        available_set = set(available_models)
+        
+        for candidate in GEMINI_MODEL_CANDIDATES:
+            # list_models() reports qualified names such as "models/gemini-pro"
+            for name in (f"models/{candidate}", candidate):
+                if name in available_set:
+                    return name
+            # Fall back to versioned variants such as "models/gemini-pro-001"
+            for available_model in available_models:
+                if candidate in available_model:
+                    return available_model
+        
+        # If no specific model found, use the first available
+        return available_models[0] if available_models else None
+    
+    def _load_cached_model_name(self) -> Optional[str]:
+        """Read the model chosen by a previous discovery if it is still fresh"""
+        try:
+            with open(MODEL_CACHE_FILE, "r") as f:
+                cached = json.load(f)
+            if time.time() - cached["ts"] < MODEL_CACHE_TTL:
+                return cached["name"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+    
+    def _save_cached_model_name(self, model_name: str):
+        """Persist the discovered model so later starts can skip discovery"""
+        try:
+            # Write then rename, so workers starting together never read a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(MODEL_CACHE_FILE)))
+            with os.fdopen(fd, "w") as f:
+                json.dump({"name": model_name, "ts": time.time()}, f)
+            os.replace(tmp_path, MODEL_CACHE_FILE)
+        except OSError as e:
+            logger.warning(f"Could not write model cache: {e}")
+    
+    def _refresh_stale_model(self, failed_model: str, error: Exception) -> bool:
+        """Rediscover the model when a cached name is rejected; True if the call should be retried"""
+        if not isinstance(error, (google_exceptions.NotFound, google_exceptions.PermissionDenied)):
+            return False
+        with self._model_lock:
+            if self.model_name != failed_model:
+                # Another thread already replaced it
+                return True
+            if not self._model_from_cache:
+                # Pinned via GEMINI_MODEL_NAME or freshly discovered; nothing to invalidate
+                return False
+            logger.warning(f"⚠️ Cached Gemini model {failed_model} was rejected ({error}), rediscovering")
+            self._model_from_cache = False
+            try:
+                os.remove(MODEL_CACHE_FILE)
+            except OSError:
+                pass
+            try:
+                return self._use_discovered_model()
+            except Exception as e:
+                logger.error(f"❌ Gemini model rediscovery failed: {e}")
+                return False
+    
+    def _generate_content(self, prompt: str, **kwargs):
+        """Call the model, retrying once on a freshly discovered model if the cached one is stale"""
+        model_name = self.model_name
+        try:
+            return self.model.generate_content(prompt, **kwargs)
+        except Exception as e:
+            if not self._refresh_stale_model(model_name, e):
+                raise
+        return self.model.generate_content(prompt, **kwargs)
+    
     def is_initialized(self):
         """Check if Gemini is initialized"""
         return self.model is not None
@@ -69,40 +208,75 @@ class GeminiHandler:
     def generate_response(self, prompt: str) -> str:
         """Generate response using Gemini AI"""
         if not self.is_initialized():
-            return "I'm running in basic mode. For AI features, please add your Gemini API key to the .env file."
+            return BASIC_MODE_RESPONSE
+        
+        key = self._cache_key(prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
         
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            response = self._generate_content(prompt)
+            text = response.text
+            self._cache_put(key, text)
+            return text
         except Exception as e:
             logger.error(f"Error generating response: {e}")
             return f"I encountered an error: {str(e)[:100]}"
     
-    def analyze_query_simple(self, user_query: str) -> Dict[str, str]:
-        """Simple query analysis without complex JSON parsing"""
-        query_lower = user_query.lower()
+    def generate_response_stream(self, prompt: str) -> Iterator[str]:
+        """Generate response using Gemini AI, yielding text chunks as they arrive"""
+        if not self.is_initialized():
+            yield BASIC_MODE_RESPONSE
+            return
         
-        # Determine entity
-        if any(word in query_lower for word in ["user", "customer", "person", "people"]):
-            entity = "users"
-        elif any(word in query_lower for word in ["product", "item", "goods", "item"]):
-            entity = "products"
-        elif any(word in query_lower for word in ["order", "sale", "purchase", "transaction"]):
-            entity = "orders"
-        elif any(word in query_lower for word in ["all", "everything", "summary", "overview"]):
-            entity = "all"
-        else:
-            entity = "general"
+        key = self._cache_key(prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            yield cached
+            return
         
-        # Determine action
-        if any(word in query_lower for word in ["count", "how many", "number", "total"]):
-            action = "count"
-        elif any(word in query_lower for word in ["show", "display", "list", "get", "find", "search"]):
-            action = "list"
-        elif any(word in query_lower for word in ["price", "cost", "expensive", "cheap"]):
-            action = "price_query"
-        else:
-            action = "general"
+        try:
+            chunks = []
+            # With stream=True the first chunk is fetched up front, so a stale model fails here
+            for chunk in self._generate_content(prompt, stream=True):
+                chunks.append(chunk.text)
+                yield chunk.text
+            self._cache_put(key, "".join(chunks))
+        except Exception as e:
+            logger.error(f"Error streaming response: {e}")
+            # Raise rather than yield the error text, so callers can tell it apart from a reply
+            raise GeminiAPIError(str(e)[:100]) from e
+    
+    @staticmethod
+    def _cache_key(prompt: str) -> bytes:
+        """Hash a prompt into a compact cache key"""
+        return hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).digest()
+    
+    def _cache_get(self, key: bytes) -> Optional[str]:
+        """Return a cached response if present and not expired"""
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            created_at, text = entry
+            if time.monotonic() - created_at > RESPONSE_CACHE_TTL:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return text
+    
+    def _cache_put(self, key: bytes, text: str):
+        """Store a response, evicting the least recently used entry when full"""
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic(), text)
+            self._cache.move_to_end(key)
+            if len(self._cache) > RESPONSE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+    
+    def analyze_query_simple(self, user_query: str) -> Dict[str, str]:
+        """Simple query analysis without complex JSON parsing"""
+        entity, action = _classify_query(user_query.lower())
         
         return {
             "entity": entity,
@@ -1,16 +1,56 @@
-from typing import Dict, Any
-from datetime import datetime
+from typing import Dict, Any, Optional, Iterator
+from functools import lru_cache
 from database.mongodb_handler import MongoDBHandler
 from agents.gemini_handler import GeminiHandler
+from utils import now_iso
+from exceptions import QueryProcessingError
+import json
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Built once at import. The fixed instructions come first so every prompt
+# shares a byte-identical prefix that Gemini's implicit caching can reuse;
+# only the query and data after the separator vary between calls
+RESPONSE_PROMPT_TEMPLATE = """You are a friendly data assistant for an online store.
+Please provide a helpful, friendly response based on the data below.
+If showing counts, mention the numbers clearly.
+If showing lists, summarize what's available.
+Keep it conversational and helpful.
+
+---
+User asked: "{user_query}"
+
+Data from database: {data}
+
+Response:"""
+
+# Words that never make sense as a product search term
+SEARCH_STOPWORDS = frozenset({"find", "search", "for", "me", "show", "all", "the", "a", "an"})
+
+@lru_cache(maxsize=1024)
+def _extract_search_term(query: str) -> Optional[str]:
+    """Return the first word of a lowercased query that is not a stopword"""
+    return next((word for word in query.split() if word not in SEARCH_STOPWORDS), None)
+
 class QueryAgent:
     def __init__(self):
         self.db_handler = MongoDBHandler()
         self.gemini = GeminiHandler()
+        # Per-entity dispatch tables; unknown entities fall back to the summary
+        self._data_handlers = {
+            "users": self._get_users_data,
+            "products": self._get_products_data,
+            "orders": self._get_orders_data,
+            "all": self._get_summary_data,
+        }
+        self._response_handlers = {
+            "users": self._users_response,
+            "products": self._products_response,
+            "orders": self._orders_response,
+            "all": self._summary_response,
+        }
         logger.info(f"📊 Database connected: {self.db_handler.is_connected()}")
         logger.info(f"🤖 Gemini AI initialized: {self.gemini.is_initialized()}")
     
@@ -34,7 +74,7 @@ class QueryAgent:
                 "response": response,
                 "data": data,
                 "analysis": analysis,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": now_iso(),
                 "status": "success"
             }
             
@@ -43,117 +83,126 @@ class QueryAgent:
             return {
                 "response": f"Sorry, I encountered an error: {str(e)}",
                 "data": None,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": now_iso(),
                 "status": "error"
             }
     
+    def process_query_stream(self, user_query: str, session_id: str = "default") -> Iterator[str]:
+        """Process user query, yielding the response in chunks as it is generated"""
+        try:
+            analysis = self.gemini.analyze_query_simple(user_query)
+            logger.info(f"Analysis: {analysis}")
+            
+            data = self._get_data(analysis)
+            
+            if self.gemini.is_initialized():
+                chunks = []
+                for chunk in self.gemini.generate_response_stream(self._build_prompt(user_query, data)):
+                    chunks.append(chunk)
+                    yield chunk
+                response = "".join(chunks)
+            else:
+                response = self._generate_response(user_query, data, analysis)
+                yield response
+            
+            # Only reached when the reply completed; a failed stream raises past this
+            self.db_handler.save_conversation(session_id, user_query, response, analysis)
+            
+        except Exception as e:
+            logger.error(f"Error: {e}")
+            # Raised rather than yielded so the caller can report it apart from the reply
+            raise QueryProcessingError(str(e)) from e
+    
     def _get_data(self, analysis: Dict[str, str]) -> Dict:
         """Get data based on analysis"""
         entity = analysis.get("entity", "general")
-        action = analysis.get("action", "general")
-        
-        if entity == "users":
-            if action == "count":
-                return {"count": self.db_handler.get_user_count(), "type": "users"}
-            else:
-                return {"users": self.db_handler.get_users(), "count": self.db_handler.get_user_count()}
-        
-        elif entity == "products":
-            if action == "count":
-                return {"count": self.db_handler.get_product_count(), "type": "products"}
-            else:
-                # Check if it's a search
-                query = analysis.get("query", "").lower()
-                if "search" in query or "find" in query:
-                    # Extract search term (simple approach)
-                    words = query.split()
-                    for word in words:
-                        if word not in ["find", "search", "for", "me", "show", "all"]:
-                            products = self.db_handler.search_products(word)
-                            return {"products": products, "count": len(products), "searched_for": word}
-                
-                return {"products": self.db_handler.get_products(), "count": self.db_handler.get_product_count()}
-        
-        elif entity == "orders":
-            if action == "count":
-                return {
-                    "count": len(self.db_handler.get_orders()),
-                    "total_sales": self.db_handler.get_total_sales(),
-                    "type": "orders"
-                }
-            else:
-                orders = self.db_handler.get_orders()
-                return {"orders": orders, "count": len(orders), "total_sales": self.db_handler.get_total_sales()}
+        return self._data_handlers.get(entity, self._get_summary_data)(analysis)
+    
+    def _get_users_data(self, analysis: Dict[str, str]) -> Dict:
+        if analysis.get("action") == "count":
+            return {"count": self.db_handler.get_user_count(), "type": "users"}
+        users, count = self.db_handler.fetch_concurrently(
+            self.db_handler.get_users, self.db_handler.get_user_count
+        )
+        return {"users": users, "count": count}
+    
+    def _get_products_data(self, analysis: Dict[str, str]) -> Dict:
+        if analysis.get("action") == "count":
+            return {"count": self.db_handler.get_product_count(), "type": "products"}
         
-        elif entity == "all":
-            return self.db_handler.get_all_data_summary()
+        # Check if it's a search
+        query = analysis.get("query", "").lower()
+        if "search" in query or "find" in query:
+            term = _extract_search_term(query)
+            if term:
+                products = self.db_handler.search_products(term)
+                return {"products": products, "count": len(products), "searched_for": term}
         
-        else:
-            # General query - return summary
-            return self.db_handler.get_all_data_summary()
+        products, count = self.db_handler.fetch_concurrently(
+            self.db_handler.get_products, self.db_handler.get_product_count
+        )
+        return {"products": products, "count": count}
+    
+    def _get_orders_data(self, analysis: Dict[str, str]) -> Dict:
+        orders, total_sales = self.db_handler.fetch_concurrently(
+            self.db_handler.get_orders, self.db_handler.get_total_sales
+        )
+        if analysis.get("action") == "count":
+            return {"count": len(orders), "total_sales": total_sales, "type": "orders"}
+        return {"orders": orders, "count": len(orders), "total_sales": total_sales}
+    
+    def _get_summary_data(self, analysis: Dict[str, str]) -> Dict:
+        return self.db_handler.get_all_data_summary()
+    
+    def _build_prompt(self, user_query: str, data: Dict) -> str:
+        """Fill the response prompt template with the query and its data"""
+        # Compact, key-sorted JSON keeps the prompt short and byte-stable across calls
+        data_json = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+        return RESPONSE_PROMPT_TEMPLATE.format(user_query=user_query, data=data_json)
     
     def _generate_response(self, user_query: str, data: Dict, analysis: Dict) -> str:
         """Generate response based on data"""
         
         # If Gemini is available, use it for better responses
         if self.gemini.is_initialized():
-            prompt = f"""
-            User asked: "{user_query}"
-            
-            Data from database: {data}
-            
-            Please provide a helpful, friendly response based on this data.
-            If showing counts, mention the numbers clearly.
-            If showing lists, summarize what's available.
-            Keep it conversational and helpful.
-            
-            Response:
-            """
-            return self.gemini.generate_response(prompt)
+            return self.gemini.generate_response(self._build_prompt(user_query, data))
         
         # Fallback simple responses
         entity = analysis.get("entity", "general")
-        action = analysis.get("action", "general")
-        
-        if entity == "users" and action == "count":
-            count = data.get("count", 0)
-            return f"We have {count} users in the database."
-        
-        elif entity == "users":
-            users = data.get("users", [])
-            count = len(users)
-            if count > 0:
-                names = ", ".join([user.get("name", "Unknown") for user in users[:3]])
-                more = " and more..." if count > 3 else ""
-                return f"Found {count} users. Some of them are: {names}{more}"
-            else:
-                return "No users found in the database."
-        
-        elif entity == "products" and action == "count":
-            count = data.get("count", 0)
-            return f"We have {count} products available."
-        
-        elif entity == "products":
-            products = data.get("products", [])
-            count = len(products)
-            if count > 0:
-                if "searched_for" in data:
-                    search_term = data["searched_for"]
-                    return f"Found {count} products matching '{search_term}'."
-                else:
-                    return f"We have {count} products in various categories."
-            else:
-                return "No products found."
+        return self._response_handlers.get(entity, self._summary_response)(data, analysis)
+    
+    def _users_response(self, data: Dict, analysis: Dict) -> str:
+        if analysis.get("action") == "count":
+            return f"We have {data.get('count', 0)} users in the database."
         
-        elif entity == "orders":
-            count = data.get("count", 0)
-            total_sales = data.get("total_sales", 0)
-            return f"We have {count} orders with total sales of ${total_sales:,.2f}."
+        users = data.get("users", [])
+        count = len(users)
+        if count == 0:
+            return "No users found in the database."
+        names = ", ".join([user.get("name", "Unknown") for user in users[:3]])
+        more = " and more..." if count > 3 else ""
+        return f"Found {count} users. Some of them are: {names}{more}"
+    
+    def _products_response(self, data: Dict, analysis: Dict) -> str:
+        if analysis.get("action") == "count":
+            return f"We have {data.get('count', 0)} products available."
         
-        else:
-            # General response
-            summary = self.db_handler.get_all_data_summary()
-            return f"Here's what I found: {summary['users']} users, {summary['products']} products, and total sales of ${summary['total_sales']:,.2f}."
+        products = data.get("products", [])
+        count = len(products)
+        if count == 0:
+            return "No products found."
+        if "searched_for" in data:
+            return f"Found {count} products matching '{data['searched_for']}'."
+        return f"We have {count} products in various categories."
+    
+    def _orders_response(self, data: Dict, analysis: Dict) -> str:
+        count = data.get("count", 0)
+        total_sales = data.get("total_sales", 0)
+        return f"We have {count} orders with total sales of ${total_sales:,.2f}."
+    
+    def _summary_response(self, data: Dict, analysis: Dict) -> str:
+        # `data` is already the summary from _get_summary_data, so no second fetch
+        return f"Here's what I found: {data['users']} users, {data['products']} products, and total sales of ${data['total_sales']:,.2f}."
     
     def chat(self, message: str) -> str:
         """Simple chat interface"""
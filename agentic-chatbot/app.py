@@ -1,9 +1,13 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from agents.query_agent import QueryAgent
 from config import config
+from functools import lru_cache
+import json
 import logging
-from datetime import datetime
+import os
+import time
+from utils import now_iso
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,11 +16,14 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
-# Initialize the agent
-agent = QueryAgent()
+@lru_cache(maxsize=None)
+def get_agent() -> QueryAgent:
+    """Build the agent on first use, once per worker process"""
+    return QueryAgent()
 
 @app.route('/')
 def home():
+    agent = get_agent()
     return jsonify({
         "message": "🤖 Agentic Chatbot API",
         "status": "running",
@@ -24,6 +31,7 @@ def home():
         "gemini_ai": "active" if agent.gemini.is_initialized() else "basic_mode",
         "endpoints": {
             "/chat": "POST - Chat with the agent",
+            "/chat/stream": "POST - Chat with the agent, streaming the reply as server-sent events",
             "/health": "GET - Check system health",
             "/info": "GET - Get system information"
         }
@@ -38,7 +46,7 @@ def chat():
             return jsonify({"error": "Message is required"}), 400
         
         message = data['message'].strip()
-        session_id = data.get('session_id', f"session_{datetime.now().timestamp()}")
+        session_id = data.get('session_id', f"session_{time.time()}")
         
         if not message:
             return jsonify({"error": "Message cannot be empty"}), 400
@@ -46,6 +54,7 @@ def chat():
         logger.info(f"💬 Processing: {message}")
         
         # Process query
+        agent = get_agent()
         result = agent.process_query(message, session_id)
         
         response = {
@@ -68,12 +77,51 @@ def chat():
             "error": True
         }), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Chat endpoint that streams the response as server-sent events"""
+    try:
+        data = request.json
+        if not data or 'message' not in data:
+            return jsonify({"error": "Message is required"}), 400
+        
+        message = data['message'].strip()
+        session_id = data.get('session_id', f"session_{time.time()}")
+        
+        if not message:
+            return jsonify({"error": "Message cannot be empty"}), 400
+        
+        logger.info(f"💬 Streaming: {message}")
+        agent = get_agent()
+        
+        def events():
+            # JSON-encode each chunk so newlines in the text cannot break SSE framing
+            try:
+                for chunk in agent.process_query_stream(message, session_id):
+                    yield f"data: {json.dumps({'delta': chunk})}\n\n"
+            except Exception as e:
+                # A separate event type, so clients never mistake the error for reply text
+                error = f"Sorry, I encountered an error: {str(e)}"
+                yield f"event: error\ndata: {json.dumps({'error': error})}\n\n"
+                return
+            yield f"event: done\ndata: {json.dumps({'session_id': session_id})}\n\n"
+        
+        return Response(stream_with_context(events()), mimetype="text/event-stream")
+        
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        return jsonify({
+            "response": f"Sorry, I encountered an error: {str(e)}",
+            "error": True
+        }), 500
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    agent = get_agent()
     return jsonify({
         "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": now_iso(),
         "database": agent.db_handler.is_connected(),
         "gemini": agent.gemini.is_initialized()
     })
@@ -81,6 +129,7 @@ def health_check():
 @app.route('/info', methods=['GET'])
 def system_info():
     """Get system information"""
+    agent = get_agent()
     return jsonify({
         "database": {
             "connected": agent.db_handler.is_connected(),
@@ -111,5 +160,7 @@ if __name__ == '__main__':
     logger.info(f"🚀 Starting Agentic Chatbot on port {config.PORT}")
     logger.info(f"📊 MongoDB: {config.MONGO_URI}")
     logger.info(f"🗃️ Database: {config.DATABASE_NAME}")
-    logger.info(f"🤖 Gemini: {'Active' if agent.gemini.is_initialized() else 'Basic Mode'}")
+    # With the debug reloader on, only the serving child process needs the agent
+    if not config.DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        logger.info(f"🤖 Gemini: {'Active' if get_agent().gemini.is_initialized() else 'Basic Mode'}")
     app.run(host='0.0.0.0', port=config.PORT, debug=config.DEBUG)
\ No newline at end of file
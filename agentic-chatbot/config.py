@@ -1,30 +1,39 @@
 import os
 import re
+from functools import lru_cache
 from dotenv import load_dotenv
-from urllib.parse import urlparse
 
 load_dotenv()
 
+# Database name is the first path segment after the host list
+_DB_NAME_RE = re.compile(r"^mongodb(?:\+srv)?://[^/]+/([^/?#]+)")
+
 class Config:
     # MongoDB Configuration
     MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/").strip('"').strip("'")
     
     # Extract database name from URI
     @staticmethod
+    @lru_cache(maxsize=4)
     def extract_db_name(uri):
-        try:
-            parsed = urlparse(uri)
-            if parsed.path and parsed.path != '/':
-                db_name = parsed.path.lstrip('/').split('/')[0]
-                return db_name if db_name else "chatbot_db"
-            return "chatbot_db"
-        except:
-            return "chatbot_db"
+        match = _DB_NAME_RE.match(uri)
+        return match.group(1) if match else "chatbot_db"
     
     DATABASE_NAME = os.getenv("DATABASE_NAME") or extract_db_name(MONGO_URI)
+    # Optional: overrides maxPoolSize from MONGO_URI (driver default 100)
+    MONGO_MAX_POOL_SIZE = os.getenv("MONGO_MAX_POOL_SIZE", "")
+    # fetch_concurrently puts at most one read per request on the pool, so size it
+    # to the request threads per worker (see gunicorn_conf.py)
+    DATABASE_FETCH_WORKERS = int(os.getenv("GUNICORN_THREADS", 8))
+    # Optional: override readPreference / compressors from MONGO_URI
+    # (e.g. "secondaryPreferred" and "zlib", which needs no extra package)
+    MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "")
+    MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
     
     # Gemini AI Configuration
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "").strip('"').strip("'")
+    # Optional: pin a model (e.g. "models/gemini-1.5-flash") and skip model discovery
+    GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "").strip('"').strip("'")
     
     # Application Configuration
     DEBUG = os.getenv("DEBUG", "True").lower() == "true"
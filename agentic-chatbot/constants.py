@@ -13,6 +13,11 @@ DEFAULT_DATABASE_NAME = "chatbot_db"
 DEFAULT_USERS_COLLECTION = "users"
 DEFAULT_MESSAGES_COLLECTION = "messages"
 DEFAULT_CONVERSATIONS_COLLECTION = "conversations"
+CONVERSATION_FLUSH_INTERVAL = 0.1  # seconds
+CONVERSATION_FLUSH_BATCH_SIZE = 100
+CONVERSATION_QUEUE_MAX_SIZE = 10000  # pending conversations before new ones are dropped
+CONVERSATION_SHUTDOWN_TIMEOUT = 5  # seconds
+COUNT_CACHE_TTL = 30  # seconds
 
 # Validation Constants
 MIN_QUERY_LENGTH = 1
@@ -31,3 +36,9 @@ LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 # Timeouts
 DATABASE_TIMEOUT = 5000  # milliseconds
 API_TIMEOUT = 30  # seconds
+
+# Caching
+RESPONSE_CACHE_SIZE = 1024  # entries
+RESPONSE_CACHE_TTL = API_TIMEOUT  # seconds
+MODEL_CACHE_FILE = ".gemini_model_cache"
+MODEL_CACHE_TTL = 24 * 60 * 60  # seconds
@@ -1,19 +1,76 @@
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, PyMongoError
-from datetime import datetime
-from typing import Optional, List, Dict, Any
+from pymongo import MongoClient, TEXT
+from pymongo.errors import BulkWriteError, ConnectionFailure, PyMongoError
+from bson import ObjectId
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Callable
 from config import config
+from constants import CONVERSATION_FLUSH_INTERVAL, CONVERSATION_FLUSH_BATCH_SIZE, CONVERSATION_QUEUE_MAX_SIZE, CONVERSATION_SHUTDOWN_TIMEOUT, COUNT_CACHE_TTL
+import atexit
 import logging
+import queue
+import threading
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Projections matching the fields the agent actually uses (same shape as the demo data)
+USER_FIELDS = {"_id": 0, "id": 1, "name": 1, "email": 1, "age": 1}
+PRODUCT_FIELDS = {"_id": 0, "id": 1, "name": 1, "price": 1, "category": 1}
+ORDER_FIELDS = {"_id": 0, "id": 1, "user_id": 1, "total_amount": 1, "status": 1}
+PRODUCT_SEARCH_FIELDS = {**PRODUCT_FIELDS, "score": {"$meta": "textScore"}}
+
+# Demo data served when no database is connected; built once and shared
+# across calls, so callers must treat the returned records as read-only
+DEMO_USERS = (
+    {"id": "1", "name": "John Doe", "email": "john@example.com", "age": 30},
+    {"id": "2", "name": "Jane Smith", "email": "jane@example.com", "age": 25},
+)
+DEMO_PRODUCTS = (
+    {"id": "1", "name": "Laptop", "price": 999.99, "category": "Electronics"},
+    {"id": "2", "name": "T-shirt", "price": 19.99, "category": "Clothing"},
+)
+DEMO_ORDERS = (
+    {"id": "1", "user_id": "1", "total_amount": 999.99, "status": "completed"},
+    {"id": "2", "user_id": "2", "total_amount": 39.98, "status": "pending"},
+)
+
+# Queued at shutdown; the conversation writer saves what it holds and exits on it
+_FLUSH_STOP = object()
+
 class MongoDBHandler:
+    # One handler (and one connection pool) per process
+    _instance = None
+    _instance_lock = threading.Lock()
+    _initialized = False
+    
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+        return cls._instance
+    
     def __init__(self):
-        self.client = None
-        self.db = None
-        self.connect()
-        self.ensure_collections()
+        with self._instance_lock:
+            if self._initialized:
+                return
+            self.client = None
+            self.db = None
+            self._executor = ThreadPoolExecutor(max_workers=config.DATABASE_FETCH_WORKERS,
+                                                thread_name_prefix="mongo-fetch")
+            self._conv_queue = queue.Queue(maxsize=CONVERSATION_QUEUE_MAX_SIZE)
+            self._count_cache = {}
+            self._writer = None
+            self.connect()
+            self.ensure_collections()
+            if self.is_connected():
+                # Conversations are written in batches off the request path
+                self._writer = threading.Thread(target=self._flush_loop, name="conversation-flush",
+                                                daemon=True)
+                self._writer.start()
+                atexit.register(self.flush_conversations)
+            self._initialized = True
     
     def connect(self):
         """Establish connection to MongoDB"""
@@ -21,7 +78,20 @@ class MongoDBHandler:
             logger.info(f"Connecting to MongoDB...")
             logger.info(f"URI: {config.MONGO_URI[:30]}...")  # Show only first 30 chars for security
             
-            self.client = MongoClient(config.MONGO_URI, serverSelectionTimeoutMS=5000)
+            # Keyword options win over the URI, so only pass ones set explicitly
+            client_options = {}
+            if config.MONGO_READ_PREFERENCE:
+                client_options["readPreference"] = config.MONGO_READ_PREFERENCE
+            if config.MONGO_COMPRESSORS:
+                client_options["compressors"] = config.MONGO_COMPRESSORS
+            if config.MONGO_MAX_POOL_SIZE:
+                client_options["maxPoolSize"] = int(config.MONGO_MAX_POOL_SIZE)
+            
+            self.client = MongoClient(
+                config.MONGO_URI,
+                serverSelectionTimeoutMS=5000,
+                **client_options
+            )
             
             # Test the connection
             self.client.admin.command('ping')
@@ -30,10 +100,6 @@ class MongoDBHandler:
             logger.info(f"✅ Successfully connected to MongoDB")
             logger.info(f"📊 Database: {config.DATABASE_NAME}")
             
-            # List collections
-            collections = self.db.list_collection_names()
-            logger.info(f"📁 Collections: {collections}")
-            
         except ConnectionFailure as e:
             logger.error(f"❌ Failed to connect to MongoDB: {e}")
             logger.info("⚠️ Running in demo mode without database")
@@ -50,6 +116,7 @@ class MongoDBHandler:
             return
             
         collections = self.db.list_collection_names()
+        logger.info(f"📁 Collections: {collections}")
         required_collections = [
             config.USER_COLLECTION,
             config.PRODUCT_COLLECTION,
@@ -61,29 +128,56 @@ class MongoDBHandler:
             if collection not in collections:
                 logger.info(f"Creating collection: {collection}")
                 self.db.create_collection(collection)
+        
+        # Text index backing search_products; create_index is a no-op if it exists
+        try:
+            self.db[config.PRODUCT_COLLECTION].create_index(
+                [("name", TEXT), ("description", TEXT), ("category", TEXT)],
+                name="product_text_search"
+            )
+        except PyMongoError as e:
+            logger.warning(f"⚠️ Could not create product text index: {e}")
     
     def is_connected(self):
         """Check if MongoDB is connected - FIXED VERSION"""
         return self.client is not None
     
+    def fetch_concurrently(self, *calls: Callable[[], Any]) -> List[Any]:
+        """Run independent read calls in parallel, returning results in call order"""
+        if not self.is_connected() or len(calls) < 2:
+            # Demo data is local, so there is no round-trip to overlap
+            return [call() for call in calls]
+        # Only the first (slowest) call takes a pool thread; the rest, typically
+        # cached counts, run inline meanwhile instead of queueing for the pool
+        first = self._executor.submit(calls[0])
+        rest = [call() for call in calls[1:]]
+        return [first.result(), *rest]
+    
+    def _estimated_count(self, collection_name: str) -> int:
+        """Approximate collection size from metadata, cached for COUNT_CACHE_TTL seconds"""
+        cached = self._count_cache.get(collection_name)
+        if cached and time.monotonic() - cached[0] < COUNT_CACHE_TTL:
+            return cached[1]
+        # Reads collection metadata instead of scanning like count_documents({})
+        count = self.db[collection_name].estimated_document_count()
+        self._count_cache[collection_name] = (time.monotonic(), count)
+        return count
+    
     # User operations
     def get_user_count(self) -> int:
         if not self.is_connected():
             return 25  # Demo data
         try:
-            return self.db[config.USER_COLLECTION].count_documents({})
+            return self._estimated_count(config.USER_COLLECTION)
         except:
             return 0
     
     def get_users(self, limit: int = 10) -> List[Dict]:
         if not self.is_connected():
-            # Return demo data
-            return [
-                {"id": "1", "name": "John Doe", "email": "john@example.com", "age": 30},
-                {"id": "2", "name": "Jane Smith", "email": "jane@example.com", "age": 25}
-            ]
+            return list(DEMO_USERS)
         try:
-            return list(self.db[config.USER_COLLECTION].find().limit(limit))
+            # One batch of exactly `limit` docs instead of the default 101-doc first batch
+            return list(self.db[config.USER_COLLECTION].find({}, USER_FIELDS).limit(limit).batch_size(limit))
         except:
             return []
     
@@ -92,37 +186,32 @@ class MongoDBHandler:
         if not self.is_connected():
             return 50  # Demo data
         try:
-            return self.db[config.PRODUCT_COLLECTION].count_documents({})
+            return self._estimated_count(config.PRODUCT_COLLECTION)
         except:
             return 0
     
     def get_products(self, limit: int = 10) -> List[Dict]:
         if not self.is_connected():
-            # Return demo data
-            return [
-                {"id": "1", "name": "Laptop", "price": 999.99, "category": "Electronics"},
-                {"id": "2", "name": "T-shirt", "price": 19.99, "category": "Clothing"}
-            ]
+            return list(DEMO_PRODUCTS)
         try:
-            return list(self.db[config.PRODUCT_COLLECTION].find().limit(limit))
+            return list(self.db[config.PRODUCT_COLLECTION].find({}, PRODUCT_FIELDS).limit(limit).batch_size(limit))
         except:
             return []
     
     def search_products(self, keyword: str) -> List[Dict]:
         if not self.is_connected():
             # Demo search
-            return [
-                {"id": "1", "name": "Laptop", "price": 999.99, "category": "Electronics"}
-            ]
+            return list(DEMO_PRODUCTS[:1])
         try:
-            query = {
-                "$or": [
-                    {"name": {"$regex": keyword, "$options": "i"}},
-                    {"description": {"$regex": keyword, "$options": "i"}},
-                    {"category": {"$regex": keyword, "$options": "i"}}
-                ]
-            }
-            return list(self.db[config.PRODUCT_COLLECTION].find(query).limit(10))
+            query = {"$text": {"$search": keyword}}
+            cursor = (
+                self.db[config.PRODUCT_COLLECTION]
+                .find(query, PRODUCT_SEARCH_FIELDS)
+                .sort([("score", {"$meta": "textScore"})])
+                .limit(10)
+                .batch_size(10)
+            )
+            return list(cursor)
         except:
             return []
     
@@ -141,39 +230,108 @@ class MongoDBHandler:
     
     def get_orders(self, limit: int = 10) -> List[Dict]:
         if not self.is_connected():
-            # Return demo data
-            return [
-                {"id": "1", "user_id": "1", "total_amount": 999.99, "status": "completed"},
-                {"id": "2", "user_id": "2", "total_amount": 39.98, "status": "pending"}
-            ]
+            return list(DEMO_ORDERS)
         try:
-            return list(self.db[config.ORDERS_COLLECTION].find().limit(limit))
+            return list(self.db[config.ORDERS_COLLECTION].find({}, ORDER_FIELDS).limit(limit).batch_size(limit))
         except:
             return []
     
+    # Bulk operations
+    def insert_many(self, collection_name: str, docs: List[Dict], ordered: bool = False) -> int:
+        """Insert documents in one round-trip and return how many were written"""
+        if not self.is_connected() or not docs:
+            return 0
+        try:
+            result = self.db[collection_name].insert_many(docs, ordered=ordered)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            # Unordered inserts keep going past bad documents; report what landed
+            logger.error(f"❌ Some inserts into {collection_name} failed: {e.details.get('writeErrors', [])[:3]}")
+            return e.details.get("nInserted", 0)
+        except PyMongoError as e:
+            logger.error(f"❌ Failed to insert into {collection_name}: {e}")
+            return 0
+    
     # Conversation logging
     def save_conversation(self, session_id: str, user_query: str, 
-                         agent_response: str, metadata: Optional[Dict] = None) -> str:
+                         agent_response: str, metadata: Optional[Dict] = None) -> Optional[str]:
         if not self.is_connected():
             return "demo_id"
+        conversation_data = {
+            # Assigned client-side so the id can be returned before the batch is written
+            "_id": ObjectId(),
+            "session_id": session_id,
+            "user_query": user_query,
+            "agent_response": agent_response,
+            "metadata": metadata or {},
+            # BSON dates are UTC; a naive local datetime would be stored shifted
+            "created_at": datetime.now(timezone.utc)
+        }
         try:
-            conversation_data = {
-                "session_id": session_id,
-                "user_query": user_query,
-                "agent_response": agent_response,
-                "metadata": metadata or {},
-                "created_at": datetime.now()
-            }
-            result = self.db[config.CONVERSATIONS_COLLECTION].insert_one(conversation_data)
-            return str(result.inserted_id)
-        except:
-            return "error_id"
+            self._conv_queue.put_nowait(conversation_data)
+        except queue.Full:
+            # The writer is stuck or far behind; drop rather than block the request or grow unbounded
+            logger.warning(f"⚠️ Conversation queue full, dropping conversation for session {session_id}")
+            return None
+        return str(conversation_data["_id"])
+    
+    def flush_conversations(self):
+        """Stop the writer after it has saved every queued conversation (used at shutdown)"""
+        try:
+            self._conv_queue.put(_FLUSH_STOP, timeout=CONVERSATION_SHUTDOWN_TIMEOUT)
+        except queue.Full:
+            logger.warning("⚠️ Conversation queue still full at shutdown")
+        self._writer.join(CONVERSATION_SHUTDOWN_TIMEOUT)
+        if self._writer.is_alive():
+            logger.warning(f"⚠️ Conversation writer still busy after {CONVERSATION_SHUTDOWN_TIMEOUT}s, unsaved conversations may be lost")
+            return
+        # The writer has exited, so anything queued behind the stop marker is safe to write here
+        batch = []
+        while True:
+            try:
+                batch.append(self._conv_queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write_conversations(batch)
+    
+    def _flush_loop(self):
+        """Background writer: batch queued conversations into insert_many calls"""
+        while True:
+            item = self._conv_queue.get()
+            if item is _FLUSH_STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + CONVERSATION_FLUSH_INTERVAL
+            while len(batch) < CONVERSATION_FLUSH_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._conv_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _FLUSH_STOP:
+                    self._write_conversations(batch)
+                    return
+                batch.append(item)
+            self._write_conversations(batch)
+    
+    def _write_conversations(self, batch: List[Dict]):
+        try:
+            self.db[config.CONVERSATIONS_COLLECTION].insert_many(batch, ordered=False)
+        except Exception as e:
+            # Anything escaping here (e.g. bson InvalidDocument) would end the writer thread
+            logger.exception(f"❌ Failed to save {len(batch)} conversations: {e}")
     
     def get_all_data_summary(self) -> Dict:
         """Get summary of all data"""
+        total_sales, users, products = self.fetch_concurrently(
+            self.get_total_sales, self.get_user_count, self.get_product_count
+        )
         return {
-            "users": self.get_user_count(),
-            "products": self.get_product_count(),
-            "total_sales": self.get_total_sales(),
+            "users": users,
+            "products": products,
+            "total_sales": total_sales,
             "connected": self.is_connected()
         }
\ No newline at end of file
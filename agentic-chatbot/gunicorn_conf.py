@@ -0,0 +1,26 @@
+"""
+Gunicorn configuration for serving the chatbot API.
+
+Usage:
+    gunicorn -c gunicorn_conf.py app:app
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Requests spend most of their time waiting on Gemini and MongoDB, so each
+# worker runs several threads to keep serving while others are blocked
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+
+# Gemini responses can take several seconds
+timeout = 60
+
+
+def post_worker_init(worker):
+    """Connect to MongoDB and Gemini before the worker accepts requests."""
+    from app import get_agent
+    get_agent()
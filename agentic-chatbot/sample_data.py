@@ -1,4 +1,5 @@
 from database.mongodb_handler import MongoDBHandler
+from config import config
 from faker import Faker
 import random
 from datetime import datetime, timedelta
@@ -21,64 +22,57 @@ def create_sample_data():
         }
         users.append(user)
     
-    # Create sample products
-    products = []
+    # Create sample products; categorical fields are drawn in one call each
     categories = ["Electronics", "Clothing", "Books", "Home", "Sports"]
-    for i in range(30):
-        product = {
+    product_categories = random.choices(categories, k=30)
+    products = [
+        {
             "id": f"PROD{i:03d}",
             "name": fake.catch_phrase(),
-            "category": random.choice(categories),
+            "category": category,
             "price": round(random.uniform(10, 1000), 2),
             "stock": random.randint(0, 100),
             "description": fake.text(max_nb_chars=100),
             "created_at": fake.date_time_this_year()
         }
-        products.append(product)
+        for i, category in enumerate(product_categories)
+    ]
     
     # Create sample orders
+    statuses = ["pending", "shipped", "delivered", "cancelled"]
+    order_users = random.choices(users, k=15)
+    order_statuses = random.choices(statuses, k=15)
     orders = []
-    for i in range(15):
-        user = random.choice(users)
-        num_products = random.randint(1, 5)
-        order_products = []
-        total = 0
-        
-        for _ in range(num_products):
-            product = random.choice(products)
-            quantity = random.randint(1, 3)
-            order_products.append({
+    for i, (user, status) in enumerate(zip(order_users, order_statuses)):
+        order_products = [
+            {
                 "product_id": product["id"],
                 "name": product["name"],
                 "price": product["price"],
-                "quantity": quantity
-            })
-            total += product["price"] * quantity
+                "quantity": random.randint(1, 3)
+            }
+            for product in random.choices(products, k=random.randint(1, 5))
+        ]
+        total = sum(item["price"] * item["quantity"] for item in order_products)
         
-        order = {
+        orders.append({
             "id": f"ORD{i:03d}",
             "user_id": user["id"],
             "products": order_products,
             "total_amount": round(total, 2),
-            "status": random.choice(["pending", "shipped", "delivered", "cancelled"]),
+            "status": status,
             "created_at": fake.date_time_this_year()
-        }
-        orders.append(order)
-    
-    # Insert into database
-    for user in users:
-        db.insert_user(user)
-    
-    for product in products:
-        db.insert_product(product)
+        })
     
-    for order in orders:
-        db.insert_order(order)
+    # Insert into database, one bulk write per collection
+    inserted_users = db.insert_many(config.USER_COLLECTION, users)
+    inserted_products = db.insert_many(config.PRODUCT_COLLECTION, products)
+    inserted_orders = db.insert_many(config.ORDERS_COLLECTION, orders)
     
     print("Sample data created successfully!")
-    print(f"Users: {len(users)}")
-    print(f"Products: {len(products)}")
-    print(f"Orders: {len(orders)}")
+    print(f"Users: {inserted_users}/{len(users)}")
+    print(f"Products: {inserted_products}/{len(products)}")
+    print(f"Orders: {inserted_orders}/{len(orders)}")
 
 if __name__ == "__main__":
     create_sample_data()
\ No newline at end of file
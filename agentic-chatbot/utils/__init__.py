@@ -3,5 +3,6 @@ Utilities module for helper functions and validators.
 """
 
 from .validators import validate_email, validate_query
+from .timestamps import now_iso
 
-__all__ = ["validate_email", "validate_query"]
+__all__ = ["validate_email", "validate_query", "now_iso"]
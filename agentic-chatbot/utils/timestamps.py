@@ -0,0 +1,27 @@
+"""
+Timestamp helpers for API responses.
+"""
+
+import time
+
+# (epoch second, formatted string) for the most recent call; swapped as one tuple
+_last_formatted = (None, "")
+
+
+def now_iso() -> str:
+    """
+    Get the current local time as an ISO 8601 string.
+    
+    The formatted value is reused for every call within the same second,
+    so request handlers skip building and formatting a datetime each time.
+    
+    Returns:
+        Timestamp string with second precision, e.g. "2024-01-31T12:00:00"
+    """
+    global _last_formatted
+    second = int(time.time())
+    cached_second, formatted = _last_formatted
+    if second != cached_second:
+        formatted = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(second))
+        _last_formatted = (second, formatted)
+    return formatted
@@ -6,6 +6,9 @@ import re
 from typing import Tuple
 
 
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+
 def validate_email(email: str) -> Tuple[bool, str]:
     """
     Validate email format.
@@ -16,8 +19,7 @@ def validate_email(email: str) -> Tuple[bool, str]:
     Returns:
         Tuple of (is_valid, message)
     """
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    if re.match(pattern, email):
+    if _EMAIL_RE.match(email):
         return True, "Valid email"
     return False, "Invalid email format"
 